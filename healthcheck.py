@@ -7,6 +7,14 @@ import os
 import sys
 import time
 
+# Maximum age of the last run before the container is considered unhealthy.
+# If BACKUP_TIME is set, we run once per day, so allow 25 hours; otherwise
+# allow 2x the configured interval (default 60 minutes).
+if os.getenv('BACKUP_TIME'):
+    MAX_ELAPSED = 25 * 60 * 60
+else:
+    MAX_ELAPSED = int(os.getenv('BACKUP_INTERVAL_MINUTES', '60')) * 60 * 2
+
 
 def check_health():
     """
@@ -16,18 +24,12 @@ def check_health():
         bool: True if healthy, False otherwise
     """
     # Check 1: Verify backup directory exists and is writable
-    try:
-        if not os.path.exists('/backups'):
+    # A single access() call covers both, including read-only mounts (EROFS)
+    if not os.access('/backups', os.W_OK):
+        if not os.path.isdir('/backups'):
             print("ERROR: Backup directory /backups does not exist", file=sys.stderr)
-            return False
-        
-        # Test write access
-        test_file = '/backups/.healthcheck'
-        with open(test_file, 'w') as f:
-            f.write('ok')
-        os.remove(test_file)
-    except Exception as e:
-        print(f"ERROR: Backup directory not writable: {e}", file=sys.stderr)
+        else:
+            print("ERROR: Backup directory /backups not writable", file=sys.stderr)
         return False
     
     # Check 2: Verify last run timestamp is recent
@@ -40,18 +42,8 @@ def check_health():
             current_time = time.time()
             elapsed = current_time - last_run_time
             
-            # Get configured interval (default 60 minutes)
-            interval_minutes = int(os.getenv('BACKUP_INTERVAL_MINUTES', '60'))
-            
-            # If BACKUP_TIME is set, we run once per day, so allow 25 hours
-            if os.getenv('BACKUP_TIME'):
-                max_elapsed = 25 * 60 * 60  # 25 hours
-            else:
-                # Allow 2x the interval before marking unhealthy
-                max_elapsed = interval_minutes * 60 * 2
-            
-            if elapsed > max_elapsed:
-                print(f"WARNING: Last run was {elapsed/3600:.1f} hours ago (max: {max_elapsed/3600:.1f}h)", file=sys.stderr)
+            if elapsed > MAX_ELAPSED:
+                print(f"WARNING: Last run was {elapsed/3600:.1f} hours ago (max: {MAX_ELAPSED/3600:.1f}h)", file=sys.stderr)
                 return False
                 
         except Exception as e:
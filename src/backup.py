@@ -1,6 +1,11 @@
 import os
 import datetime
-import glob
+import heapq
+import hashlib
+import json
+import mmap
+import re
+import socket
 import requests
 import threading
 import concurrent.futures
@@ -8,24 +13,61 @@ import yaml
 import logging
 import schedule
 import time
+import atexit
+import asyncio
+import asyncssh
 from logging.handlers import RotatingFileHandler
-from git import Repo, InvalidGitRepositoryError
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import pygit2
 from netmiko import ConnectHandler, NetmikoTimeoutException, NetmikoAuthenticationException
+from ncclient import manager as netconf_manager
+from ncclient.transport.errors import AuthenticationError as NetconfAuthenticationError, SSHError as NetconfSSHError
+from ncclient.operations.errors import OperationError as NetconfOperationError, TimeoutExpiredError as NetconfTimeoutError
 from dotenv import load_dotenv
-from jsonschema import validate, ValidationError
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+from jsonschema import Draft7Validator, ValidationError
 
 # Load environment variables
 load_dotenv()
 
-# Configuration
-PORT = os.getenv("PORT", "22")
+# Configuration (read once at import; the environment does not change at runtime)
+PORT = int(os.getenv("PORT", "22"))
+JUNIPER_USERNAME = os.getenv("JUNIPER_USERNAME")
+JUNIPER_PASSWORD = os.getenv("JUNIPER_PASSWORD")
 BACKUP_DIR = os.getenv("BACKUP_DIR", "/backups")
+MAX_BACKUPS = int(os.getenv("MAX_BACKUPS", "10"))
+# Last saved configuration hash per device, used to skip unchanged backups. Kept
+# inside .git so it never shows up as untracked in the backup repository
+HASH_STATE_FILE = os.path.join(BACKUP_DIR, ".git", "backup-hashes.json")
 # Log to stdout by default for Docker. If LOG_FILE is set, it will ALSO log to file.
 LOG_FILE = os.getenv("LOG_FILE", "/var/log/backup.log") 
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
 BACKUP_INTERVAL_MINUTES = int(os.getenv("BACKUP_INTERVAL_MINUTES", "60"))
+BACKUP_TIME = os.getenv("BACKUP_TIME")
+# Longest single sleep of the scheduler loop, in seconds
+SCHEDULER_MAX_SLEEP = 60
+# SSH client used to fetch configurations: "netmiko" (threads), "asyncssh" (event loop)
+# or "netconf" (Junos NETCONF RPC, threads)
+SSH_BACKEND = os.getenv("SSH_BACKEND", "netmiko").lower()
+NETCONF_PORT = int(os.getenv("NETCONF_PORT", "830"))
+# Parallel backups across the whole inventory, and simultaneous SSH sessions to one
+# host (keep below the device's sshd MaxStartups, 10 by default, or it drops connections)
+# Both are clamped to at least 1: 0 would make the thread pool raise or the
+# semaphores block forever, stalling the scheduler
+MAX_CONCURRENCY = max(1, int(os.getenv("MAX_CONCURRENCY", "32")))
+MAX_SESSIONS_PER_HOST = max(1, int(os.getenv("MAX_SESSIONS_PER_HOST", "4")))
+# Seconds an unused SSH session is kept open for reuse by the next run. Reuse only
+# happens when this exceeds the gap between runs, so in interval mode the default
+# covers one interval (plus margin). Daily runs don't keep sessions open overnight.
+# Sessions the device dropped in the meantime are detected and replaced on reuse.
+SESSION_IDLE_TIMEOUT = int(os.getenv(
+    "SESSION_IDLE_TIMEOUT",
+    "600" if BACKUP_TIME else str(BACKUP_INTERVAL_MINUTES * 60 + 300)
+))
+
+# Healthcheck heartbeat: healthcheck.py reads this file's modification time
+HEALTHCHECK_FILE = "/tmp/last_run"
 
 # Determine absolute path to inventory.yaml (one directory up from src/)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -35,9 +77,67 @@ INVENTORY_FILE = os.path.join(BASE_DIR, "inventory.yaml")
 # Juniper Command
 JUNIPER_COMMAND = "show configuration | display set"
 
+# SSH timeouts (seconds). The config read timeout is a ceiling, Netmiko returns
+# as soon as the prompt is seen, so it only needs to cover the largest configs.
+CONNECT_TIMEOUT = 10
+CONNECT_ATTEMPTS = 3
+CONFIG_READ_TIMEOUT = int(os.getenv("CONFIG_READ_TIMEOUT", "120"))
+
+# Matches the top-level hostname statement in 'display set' output (bytes, so it
+# runs on the encoded config without decoding it again)
+CONFIG_HOSTNAME_RE = re.compile(rb"^set system host-name (\S+)", re.MULTILINE)
+
+# Timestamp part of backup filenames: {hostname}_YYYYMMDD_HHMMSS.conf (see get_timestamp)
+BACKUP_SUFFIX_RE = re.compile(r"\d{8}_\d{6}\.conf")
+
+# Translation table to make device hostnames safe for use in filenames
+HOSTNAME_SANITIZE_TABLE = str.maketrans({**{c: "_" for c in '/\\:*?"<>|'}, ";": None})
+
 # Lock for Git operations to prevent race conditions
 GIT_LOCK = threading.Lock()
 
+# Commit identity used when the backup repository has no user.name/user.email configured
+GIT_FALLBACK_SIGNATURE = ("Juniper Backup", "backup@localhost")
+
+# HTTP session reused for every Telegram notification (keeps the TLS connection alive).
+# Rate limits and transient server errors are retried with backoff. POST has to be
+# listed explicitly since urllib3 only retries idempotent methods by default; that is
+# safe here because only failures where Telegram did not deliver the message are
+# retried (connect errors and 429/5xx). Read errors are not, the message may have
+# been sent already and a retry would post the job summary twice.
+TELEGRAM_URL = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
+TELEGRAM_SESSION = requests.Session()
+TELEGRAM_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=1,
+    pool_maxsize=4,
+    max_retries=Retry(
+        total=3,
+        connect=3,
+        read=0,
+        status=3,
+        other=0,
+        backoff_factor=0.3,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=frozenset({"POST"}),
+    ),
+))
+TELEGRAM_TIMEOUT = (5, 10)  # (connect, read) seconds
+
+# Idle SSH sessions kept between scheduled runs, keyed by (host, port, username).
+# Values are (connection, last_used) and sessions are checked out while in use.
+SESSION_CACHE = {}
+SESSION_LOCK = threading.Lock()
+
+# Per-host session limits (see MAX_SESSIONS_PER_HOST), created on first use
+HOST_SEMAPHORES = {}
+HOST_SEMAPHORES_LOCK = threading.Lock()
+
+# Parsed inventory, reused until inventory.yaml's modification time changes
+INVENTORY_CACHE = {"mtime": None, "routers": []}
+
+# libyaml-backed loader when PyYAML was built with it (much faster than pure Python)
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
 # Inventory validation schema
 INVENTORY_SCHEMA = {
     "type": "object",
@@ -79,9 +179,15 @@ INVENTORY_SCHEMA = {
     "additionalProperties": True
 }
 
+# Validator built once; jsonschema.validate() rebuilds it and re-checks the schema on every call
+Draft7Validator.check_schema(INVENTORY_SCHEMA)
+INVENTORY_VALIDATOR = Draft7Validator(INVENTORY_SCHEMA)
+
 # Logging Configuration
 logger = logging.getLogger("BackupJob")
 logger.setLevel(logging.INFO)
+# Handlers are attached below, don't hand records to the root logger as well
+logger.propagate = False
 
 # Formatter with enhanced date/time format
 formatter = logging.Formatter(
@@ -106,11 +212,13 @@ try:
     logger.addHandler(file_handler)
 except Exception as e:
     # Non-critical failure, we still have stdout
-    logger.warning(f"Could not setup file logging (likely permission issue, strictly using stdout): {e}")
+    logger.warning("Could not setup file logging (likely permission issue, strictly using stdout): %s", e)
 
 
 def get_timestamp():
-    return datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    # Formatted from the fields directly; strftime goes through the C locale machinery
+    n = datetime.datetime.now()
+    return f"{n.year:04d}{n.month:02d}{n.day:02d}_{n.hour:02d}{n.minute:02d}{n.second:02d}"
 
 def send_telegram_notification(message):
     """Sends a notification to Telegram."""
@@ -118,7 +226,6 @@ def send_telegram_notification(message):
         logger.warning("Telegram credentials not configured. Skipping notification.")
         return
 
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
     payload = {
         "chat_id": TELEGRAM_CHAT_ID,
         "text": message,
@@ -126,60 +233,216 @@ def send_telegram_notification(message):
     }
 
     try:
-        response = requests.post(url, json=payload)
+        response = TELEGRAM_SESSION.post(TELEGRAM_URL, json=payload, timeout=TELEGRAM_TIMEOUT)
         response.raise_for_status()
         logger.info("Telegram notification sent.")
     except Exception as e:
-        logger.error(f"Failed to send Telegram notification: {e}")
+        logger.error("Failed to send Telegram notification: %s", e)
 
 def init_git_repo():
     """Initializes a git repository in the backup directory if it doesn't exist."""
     try:
-        repo = Repo(BACKUP_DIR)
-    except InvalidGitRepositoryError:
+        repo = pygit2.Repository(BACKUP_DIR, flags=pygit2.GIT_REPOSITORY_OPEN_NO_SEARCH)
+    except pygit2.GitError:
         logger.info("Initializing Git repository...")
-        repo = Repo.init(BACKUP_DIR)
+        repo = pygit2.init_repository(BACKUP_DIR)
     return repo
 
-MAX_BACKUPS = int(os.getenv("MAX_BACKUPS", "10"))
+def get_git_signature(repo):
+    """Returns the repository's configured committer, or a fixed fallback identity."""
+    try:
+        return repo.default_signature
+    except (KeyError, pygit2.GitError):
+        return pygit2.Signature(*GIT_FALLBACK_SIGNATURE)
 
-def commit_to_git(repo, filename, hostname):
-    """Commits the change to git."""
+def store_git_blob(repo, data):
+    """Writes file contents to the Git object database, returning the blob id (or None)."""
+    if repo is None:
+        return None
     try:
-        repo.index.add([filename])
-        # Always commit since filename is unique
-        repo.index.commit(f"Backup {hostname} - {filename}")
-        logger.info(f"Committed {filename} to Git.")
+        return str(repo.create_blob(data))
     except Exception as e:
-        logger.error(f"Git commit failed: {e}", exc_info=True)
+        logger.warning("Could not store Git blob, file will be hashed at commit: %s", e)
+        return None
 
-def cleanup_old_backups(hostname):
-    """Keeps only the last N backups for a given hostname."""
+def commit_to_git(repo, entries, message):
+    """Commits a batch of (filename, blob_id) backup entries to git in a single commit.
+
+    Returns True if the commit was created, False otherwise.
+    """
     try:
-        # Find all backups for this hostname
-        pattern = os.path.join(BACKUP_DIR, f"{hostname}_*.conf")
-        files = glob.glob(pattern)
+        index = repo.index
+        for filename, blob_id in entries:
+            if blob_id:
+                # Blob already written from memory, just point the index at it
+                index.add(pygit2.IndexEntry(filename, pygit2.Oid(hex=blob_id), pygit2.GIT_FILEMODE_BLOB))
+            else:
+                index.add(filename)
+        index.write()
+        tree = index.write_tree()
         
-        # Sort by modification time (newest last)
-        files.sort(key=os.path.getmtime)
+        # Always commit since filenames are unique
+        parents = [] if repo.head_is_unborn else [repo.head.target]
+        signature = get_git_signature(repo)
+        repo.create_commit("HEAD", signature, signature, message, tree, parents)
+        logger.info("Committed %d files to Git.", len(entries))
+        return True
+    except Exception as e:
+        logger.error("Git commit failed: %s", e, exc_info=True)
+        return False
+
+def list_backups(hostname):
+    """Returns the backup filenames of a hostname, found in a single directory pass."""
+    # Files are named {hostname}_YYYYMMDD_HHMMSS.conf, so the name alone identifies
+    # the device exactly and sorts chronologically; no stat() calls are needed.
+    prefix = f"{hostname}_"
+    with os.scandir(BACKUP_DIR) as it:
+        return [
+            entry.name
+            for entry in it
+            if entry.name.startswith(prefix) and BACKUP_SUFFIX_RE.fullmatch(entry.name, len(prefix))
+        ]
+
+def find_latest_backup(hostname):
+    """Returns {"hash", "filename"} for the newest backup on disk of a hostname, or None."""
+    try:
+        files = list_backups(hostname)
+        if not files:
+            return None
+        filename = max(files)
+        with open(os.path.join(BACKUP_DIR, filename), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                digest = hashlib.blake2b(b"", digest_size=16).hexdigest()
+            else:
+                # Hash through an mmap to avoid copying the file into a buffer
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    digest = hashlib.blake2b(mm, digest_size=16).hexdigest()
+        return {"hash": digest, "filename": filename}
+    except Exception as e:
+        logger.warning("Could not hash latest backup of %s: %s", hostname, e)
+        return None
+
+def cleanup_old_backups(hostname):
+    """Keeps only the last N backups for a given hostname (MAX_BACKUPS <= 0 keeps all)."""
+    if MAX_BACKUPS <= 0:
+        return
+    try:
+        files = list_backups(hostname)
         
         if len(files) > MAX_BACKUPS:
-            files_to_delete = files[:-MAX_BACKUPS]
-            for f in files_to_delete:
-                os.remove(f)
-                logger.info(f"Deleted old backup: {f}")
+            # Only the oldest excess files need ordering, not the whole list
+            files_to_delete = heapq.nsmallest(len(files) - MAX_BACKUPS, files)
+            for name in files_to_delete:
+                f = os.path.join(BACKUP_DIR, name)
+                os.unlink(f)
+                logger.info("Deleted old backup: %s", f)
     except Exception as e:
-        logger.error(f"Cleanup failed for {hostname}: {e}", exc_info=True)
+        logger.error("Cleanup failed for %s: %s", hostname, e)
+
+def host_semaphore(host):
+    """Returns the semaphore limiting concurrent SSH sessions to one host."""
+    with HOST_SEMAPHORES_LOCK:
+        semaphore = HOST_SEMAPHORES.get(host)
+        if semaphore is None:
+            semaphore = HOST_SEMAPHORES[host] = threading.BoundedSemaphore(MAX_SESSIONS_PER_HOST)
+        return semaphore
+
+def session_key(device):
+    return (device["host"], device["port"], device["username"])
+
+def close_connection(net_connect):
+    """Disconnects a session, ignoring errors from already-dead transports."""
+    if net_connect is not None:
+        try:
+            net_connect.disconnect()
+        except Exception:
+            pass
+
+def get_connection(device):
+    """Checks out a live SSH session for the device, reusing an idle cached one when possible.
+
+    Returns (net_connect, reused); reused is True when the session came from SESSION_CACHE.
+    """
+    with SESSION_LOCK:
+        cached = SESSION_CACHE.pop(session_key(device), None)
+    
+    if cached is not None:
+        net_connect, _ = cached
+        if net_connect.is_alive():
+            logger.info("Reusing existing session to %s", device["host"])
+            return net_connect, True
+        close_connection(net_connect)
+
+    return ConnectHandler(**device), False
+
+def release_connection(device, net_connect):
+    """Returns a healthy session to the cache so the next run can reuse it."""
+    with SESSION_LOCK:
+        # Two inventory entries can share a key; keep one session, close the other
+        previous = SESSION_CACHE.get(session_key(device))
+        SESSION_CACHE[session_key(device)] = (net_connect, time.monotonic())
+    if previous is not None:
+        close_connection(previous[0])
+
+def reap_idle_sessions():
+    """Closes cached sessions that have been idle longer than SESSION_IDLE_TIMEOUT."""
+    cutoff = time.monotonic() - SESSION_IDLE_TIMEOUT
+    with SESSION_LOCK:
+        expired = [key for key, (_, last_used) in SESSION_CACHE.items() if last_used < cutoff]
+        sessions = [SESSION_CACHE.pop(key)[0] for key in expired]
+    for net_connect in sessions:
+        close_connection(net_connect)
+    if sessions:
+        logger.info("Closed %d idle SSH sessions", len(sessions))
+
+def start_session_reaper():
+    """Starts a daemon thread that periodically closes idle cached sessions."""
+    def reaper():
+        while True:
+            time.sleep(60)
+            reap_idle_sessions()
+
+    threading.Thread(target=reaper, name="session-reaper", daemon=True).start()
+
+@atexit.register
+def close_all_connections():
+    """Closes every cached SSH session on interpreter shutdown."""
+    with SESSION_LOCK:
+        sessions = [net_connect for net_connect, _ in SESSION_CACHE.values()]
+        SESSION_CACHE.clear()
+    for net_connect in sessions:
+        close_connection(net_connect)
+
+def load_config_hashes():
+    """Loads the last saved configuration hash and filename per device hostname."""
+    try:
+        with open(HASH_STATE_FILE, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logger.warning("Could not read %s, all configs will be saved: %s", HASH_STATE_FILE, e)
+        return {}
+
+def save_config_hashes(hashes):
+    """Persists the configuration hashes (written to a temp file, then renamed)."""
+    try:
+        tmp_file = f"{HASH_STATE_FILE}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(hashes, f, indent=2, sort_keys=True)
+        os.replace(tmp_file, HASH_STATE_FILE)
+    except Exception as e:
+        logger.warning("Could not save %s: %s", HASH_STATE_FILE, e)
 
 def validate_environment():
     """Validates critical environment variables."""
     warnings = []
     
     # Check for credentials (either in env or will be in inventory)
-    if not os.getenv("JUNIPER_USERNAME"):
+    if not JUNIPER_USERNAME:
         warnings.append("JUNIPER_USERNAME not set - ensure all devices have credentials in inventory.yaml")
     
-    if not os.getenv("JUNIPER_PASSWORD"):
+    if not JUNIPER_PASSWORD:
         warnings.append("JUNIPER_PASSWORD not set - ensure all devices have credentials in inventory.yaml")
     
     # Check Telegram config (optional but warn if incomplete)
@@ -197,127 +460,225 @@ def validate_environment():
 
 
 def load_inventory():
-    """Loads and validates device inventory from YAML file."""
-    if not os.path.exists(INVENTORY_FILE):
-        logger.error(f"Inventory file {INVENTORY_FILE} not found.")
+    """Loads and validates device inventory from YAML file (cached until the file changes)."""
+    try:
+        mtime = os.stat(INVENTORY_FILE).st_mtime_ns
+    except FileNotFoundError:
+        logger.error("Inventory file %s not found.", INVENTORY_FILE)
         return []
     
+    if mtime == INVENTORY_CACHE["mtime"]:
+        return INVENTORY_CACHE["routers"]
+    
     try:
         with open(INVENTORY_FILE, 'r') as f:
-            data = yaml.safe_load(f)
+            data = yaml.load(f, Loader=YAML_LOADER)
         
         # Validate against schema
         try:
-            validate(instance=data, schema=INVENTORY_SCHEMA)
-            logger.info(f"Inventory validation passed: {len(data.get('routers', []))} devices found")
+            INVENTORY_VALIDATOR.validate(data)
+            logger.info("Inventory validation passed: %d devices found", len(data.get('routers', [])))
         except ValidationError as ve:
-            logger.error(f"Inventory validation failed: {ve.message}")
-            logger.error(f"Failed at path: {' -> '.join(str(p) for p in ve.path)}")
+            logger.error("Inventory validation failed: %s", ve.message)
+            logger.error("Failed at path: %s", ' -> '.join(str(p) for p in ve.path))
             logger.error("Please check your inventory.yaml file format")
             return []
         
-        return data.get('routers', [])
+        # Only a valid inventory is cached, so errors keep being reported each run
+        INVENTORY_CACHE["mtime"] = mtime
+        INVENTORY_CACHE["routers"] = data.get('routers', [])
+        return INVENTORY_CACHE["routers"]
         
     except yaml.YAMLError as e:
-        logger.error(f"YAML parsing error in inventory file: {e}", exc_info=True)
+        logger.error("YAML parsing error in inventory file: %s", e)
         return []
     except Exception as e:
-        logger.error(f"Error loading inventory: {e}", exc_info=True)
+        logger.error("Error loading inventory: %s", e, exc_info=True)
         return []
 
-@retry(
-    stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=1, min=4, max=16),
-    retry=retry_if_exception_type((NetmikoTimeoutException, ConnectionError, TimeoutError)),
-    reraise=True,
-    before_sleep=lambda retry_state: logger.warning(
-        f"Retry attempt {retry_state.attempt_number} for {retry_state.args[0].get('host', 'unknown')} "
-        f"after {retry_state.outcome.exception()}"
-    )
-)
-def backup_router(device_info, repo):
-    host = device_info.get('host')
-    # Use 'platform' if provided for compatibility, but default/enforce juniper_junos logic
-    # We ignore the inventory platform and force juniper_junos as requested
-    platform = "juniper_junos"
-    
-    # Default to environment variables if not in inventory
-    username = device_info.get('username', os.getenv("JUNIPER_USERNAME"))
-    password = device_info.get('password', os.getenv("JUNIPER_PASSWORD"))
-    port = device_info.get('port', PORT)
-
-    logger.info(f"Starting backup for {host} (Juniper)...")
-    start_time = datetime.datetime.now()
-    
-    # Validation
-    if not host or not username or not password:
-         error_msg = f"Missing configuration for host {host}"
-         logger.error(error_msg)
-         return False, error_msg
-
-    device = {
-        "device_type": "juniper_junos",
-        "host": host,
-        "username": username,
-        "password": password,
-        "port": port,
-        # Increase timeout for large configs
-        "global_delay_factor": 2, 
+def parse_device_hostname(config_data, host):
+    """Extracts the device hostname from the fetched configuration, sanitized for filenames."""
+    match = CONFIG_HOSTNAME_RE.search(config_data)
+    # The fallback host is sanitized too: IPv6 addresses contain ':'
+    device_hostname = match.group(1).decode("utf-8", "replace") if match else host
+    return device_hostname.translate(HOSTNAME_SANITIZE_TABLE)
+
+def write_backup_file(filepath, data):
+    """Writes bytes to a temp file, syncs it and atomically renames it into place."""
+    # A killed process leaves at most a stray .tmp file, never a truncated .conf
+    # that rotation and Git would treat as a valid backup
+    tmp_path = f"{filepath}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_CLOEXEC, 0o644)
+    try:
+        try:
+            view = memoryview(data)
+            written = 0
+            # os.write may write less than requested, loop until everything is out
+            while written < len(view):
+                written += os.write(fd, view[written:])
+            # Data must be on disk before the rename, or a crash can leave an empty file
+            os.fdatasync(fd)
+        finally:
+            os.close(fd)
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    return written
+
+def save_backup(repo, host, device_hostname, config_data, known_hashes, start_time):
+    """Writes a fetched configuration to disk, unless it matches the last saved one."""
+    config_hash = hashlib.blake2b(config_data, digest_size=16).hexdigest()
+    
+    # Skip the write, commit and rotation when the config is identical to the last backup.
+    # Without a recorded hash (first run, lost state file) compare against the newest file.
+    previous = known_hashes.get(device_hostname) or find_latest_backup(device_hostname)
+    if (previous and previous["hash"] == config_hash
+            and os.path.exists(os.path.join(BACKUP_DIR, previous["filename"]))):
+        duration = time.perf_counter() - start_time
+        logger.info("Configuration of %s unchanged since %s", device_hostname, previous['filename'])
+        return {
+            "hostname": device_hostname,
+            "ip": host,
+            "filename": previous["filename"],
+            "size_kb": len(config_data) / 1024,
+            "duration": duration,
+            "timestamp": get_timestamp(),
+            "hash": config_hash,
+            "unchanged": True
+        }
+    
+    # Save to a timestamped filename using device hostname
+    timestamp = get_timestamp()
+    filename = f"{device_hostname}_{timestamp}.conf"
+    filepath = os.path.join(BACKUP_DIR, filename)
+    
+    file_size = write_backup_file(filepath, config_data)
+    file_size_kb = file_size / 1024
+    
+    # Calculate duration
+    duration = time.perf_counter() - start_time
+    
+    logger.info("Backup saved to %s", filepath)
+    
+    # Hash the config into Git while it is still in memory, so the
+    # job commit doesn't have to read the file back from disk
+    with GIT_LOCK:
+        blob_id = store_git_blob(repo, config_data)
+    
+    # Cleanup old backups using device hostname (files per hostname don't
+    # overlap between workers, and the commit never reads old files)
+    cleanup_old_backups(device_hostname)
+    
+    # Return success with details
+    return {
+        "hostname": device_hostname,
+        "ip": host,
+        "filename": filename,
+        "size_kb": file_size_kb,
+        "duration": duration,
+        "timestamp": timestamp,
+        "hash": config_hash,
+        "blob_id": blob_id,
+        "unchanged": False
+    }
+
+# Connection parameters shared by every device (see build_device)
+BASE_DEVICE_TEMPLATE = {
+    "device_type": "juniper_junos",
+    # Don't stretch Netmiko's internal sleeps; large configs are covered by
+    # CONFIG_READ_TIMEOUT on the config command instead
+    "fast_cli": True,
+    "global_delay_factor": 1,
+    "conn_timeout": CONNECT_TIMEOUT,
+    "banner_timeout": 15,
+    "session_timeout": 60,
+    # SSH keepalives keep cached sessions from being dropped by NAT/firewall idle timers
+    "keepalive": 30,
+}
+
+def build_device(device_info):
+    """Builds the connection parameters for a device, defaulting credentials from the environment."""
+    return {
+        **BASE_DEVICE_TEMPLATE,
+        "host": device_info.get('host'),
+        # Default to environment variables if not in inventory
+        "username": device_info.get('username', JUNIPER_USERNAME),
+        "password": device_info.get('password', JUNIPER_PASSWORD),
+        "port": device_info.get('port', PORT),
     }
 
+def complete_device(device_info):
+    """Returns (device, None) for a fully-credentialed inventory entry, or (None, error)."""
+    device = build_device(device_info)
+    if not device["host"] or not device["username"] or not device["password"]:
+        return None, f"Missing configuration for host {device['host']}"
+    return device, None
+
+def read_config(net_connect):
+    """Runs the configuration command on a Netmiko session and returns the output as bytes."""
+    # Discard anything left in the channel by a previous run on a reused session
+    net_connect.clear_buffer()
+    
+    # Get configuration, encoded once so only the bytes are kept alive
+    return net_connect.send_command(JUNIPER_COMMAND, read_timeout=CONFIG_READ_TIMEOUT).encode("utf-8")
+
+def fetch_config_netmiko(device):
+    """Fetches the configuration over a (possibly reused) Netmiko session."""
+    host = device["host"]
+    net_connect = None
     try:
-        with ConnectHandler(**device) as net_connect:
-            logger.info(f"Connected to {host}")
-            
-            # Get device hostname
+        # Limit simultaneous sessions to the same device (sshd MaxStartups)
+        with host_semaphore(host):
+            net_connect, reused = get_connection(device)
+            logger.info("Connected to %s", host)
             try:
-                 device_hostname_output = net_connect.send_command("show configuration system host-name")
-                 device_hostname = device_hostname_output.split()[-1] if device_hostname_output else host
-            except:
-                device_hostname = host
+                config_data = read_config(net_connect)
+            except Exception as e:
+                if not reused:
+                    raise
+                # A cached session can look alive locally after a middlebox dropped it;
+                # replace it with a fresh one instead of failing the device
+                logger.warning("Cached session to %s is stale (%s), reconnecting", host, e)
+                close_connection(net_connect)
+                net_connect = None
+                net_connect = ConnectHandler(**device)
+                config_data = read_config(net_connect)
+            release_connection(device, net_connect)
+            return config_data
+    except BaseException:
+        # The session may be in an unknown state, don't reuse it next run
+        close_connection(net_connect)
+        raise
 
-            # Sanitize hostname
-            device_hostname = device_hostname.replace(";", "").replace("/", "_").replace("\\", "_").replace(":", "_").replace("*", "_").replace("?", "_").replace('"', "_").replace("<", "_").replace(">", "_").replace("|", "_")
-            
-            # Get configuration
-            config_output = net_connect.send_command(JUNIPER_COMMAND)
-            
-            # Save to a timestamped filename using device hostname
-            timestamp = get_timestamp()
-            filename = f"{device_hostname}_{timestamp}.conf"
-            filepath = os.path.join(BACKUP_DIR, filename)
-            
-            with open(filepath, "w") as f:
-                f.write(config_output)
-            
-            # Get file size
-            file_size = os.path.getsize(filepath)
-            file_size_kb = file_size / 1024
-            
-            # Calculate duration
-            end_time = datetime.datetime.now()
-            duration = (end_time - start_time).total_seconds()
-            
-            logger.info(f"Backup saved to {filepath}")
-            
-            # Critical section: Git operations and cleanup must be sequential
-            with GIT_LOCK:
-                # Commit to Git
-                commit_to_git(repo, filename, device_hostname)
-                
-                # Cleanup old backups using device hostname
-                cleanup_old_backups(device_hostname)
-            
-            # Return success with details
-            return True, {
-                "hostname": device_hostname,
-                "ip": host,
-                "filename": filename,
-                "size_kb": file_size_kb,
-                "duration": duration,
-                "timestamp": timestamp
-            }
-            
+def backup_router(device, repo, known_hashes):
+    # Inventory 'platform' is ignored, juniper_junos is always used (see build_device)
+    host = device["host"]
+
+    logger.info("Starting backup for %s (Juniper)...", host)
+    start_time = time.perf_counter()
+
+    try:
+        # Retry transient network failures with exponential backoff (2s, 4s, ...);
+        # authentication failures won't fix themselves, so they are not retried
+        for attempt in range(1, CONNECT_ATTEMPTS + 1):
+            try:
+                config_data = fetch_config_netmiko(device)
+                break
+            except (NetmikoTimeoutException, ConnectionError, TimeoutError) as e:
+                if attempt == CONNECT_ATTEMPTS:
+                    raise
+                logger.warning("Retry attempt %d for %s after %s", attempt, host, e)
+                time.sleep(2 ** attempt)
+        
+        # The hostname is part of the configuration, no separate command needed
+        device_hostname = parse_device_hostname(config_data, host)
+        
+        return True, save_backup(repo, host, device_hostname, config_data, known_hashes, start_time)
+        
     except (NetmikoTimeoutException, NetmikoAuthenticationException) as e:
         error_msg = f"Failed to connect to {host}: {e}"
         logger.error(error_msg)
@@ -327,13 +688,196 @@ def backup_router(device_info, repo):
         logger.error(error_msg, exc_info=True)
         return False, error_msg
 
+def fetch_config_netconf(device):
+    """Fetches the configuration in 'display set' format with a single NETCONF RPC."""
+    # ncclient reports every socket failure as the same SSHError; opening the socket
+    # here keeps refused connections apart from timeouts and unreachable hosts
+    sock = socket.create_connection((device["host"], NETCONF_PORT), timeout=CONNECT_TIMEOUT)
+    try:
+        m = netconf_manager.connect(
+            host=device["host"],
+            port=NETCONF_PORT,
+            sock=sock,
+            username=device["username"],
+            password=device["password"],
+            hostkey_verify=False,
+            allow_agent=False,
+            look_for_keys=False,
+            device_params={"name": "junos"},
+            timeout=CONNECT_TIMEOUT,
+        )
+    except BaseException:
+        sock.close()
+        raise
+    with m:
+        m.timeout = CONFIG_READ_TIMEOUT
+        reply = m.get_configuration(format="set")
+    
+    # Junos replies are namespace-stripped by ncclient's junos handler
+    return reply.xpath("//configuration-set")[0].text or ""
+
+def backup_router_netconf(device, repo, known_hashes):
+    """Backs up a device over NETCONF, falling back to Netmiko if NETCONF is unavailable."""
+    host = device["host"]
+
+    logger.info("Starting backup for %s (Juniper, NETCONF)...", host)
+    start_time = time.perf_counter()
+
+    try:
+        with host_semaphore(host):
+            config_text = fetch_config_netconf(device)
+    except NetconfAuthenticationError as e:
+        error_msg = f"Failed to connect to {host}: {e}"
+        logger.error(error_msg)
+        return False, error_msg
+    except (ConnectionRefusedError, NetconfSSHError, NetconfOperationError) as e:
+        # NETCONF is unavailable: port closed, no netconf SSH subsystem or the RPC was
+        # rejected. It must be enabled on the device ('set system services netconf ssh')
+        logger.warning("NETCONF unavailable on %s (%s), falling back to Netmiko", host, e)
+        return backup_router(device, repo, known_hashes)
+    except (OSError, NetconfTimeoutError) as e:
+        # Unreachable host or timeout: Netmiko would fail the same way, so don't retry through it
+        error_msg = f"Failed to connect to {host}: {e}"
+        logger.error(error_msg)
+        return False, error_msg
+    except Exception as e:
+        error_msg = f"An error occurred with {host}: {e}"
+        logger.error(error_msg, exc_info=True)
+        return False, error_msg
+
+    config_data = config_text.encode("utf-8")
+    del config_text
+    device_hostname = parse_device_hostname(config_data, host)
+
+    try:
+        return True, save_backup(repo, host, device_hostname, config_data, known_hashes, start_time)
+    except Exception as e:
+        error_msg = f"An error occurred with {host}: {e}"
+        logger.error(error_msg, exc_info=True)
+        return False, error_msg
+
+async def backup_router_async(device, repo, known_hashes, job_limit, host_limit):
+    """Backs up a device over asyncssh, falling back to Netmiko if the exec channel fails."""
+    host = device["host"]
+
+    # Same limits as the thread pool path: MAX_CONCURRENCY devices in flight and
+    # MAX_SESSIONS_PER_HOST sessions per host. A Netmiko fallback runs while this
+    # device still holds both slots, so its session counts against the same limits
+    async with job_limit, host_limit:
+        logger.info("Starting backup for %s (Juniper, asyncssh)...", host)
+        start_time = time.perf_counter()
+        try:
+            async with asyncssh.connect(
+                host,
+                port=device["port"],
+                username=device["username"],
+                password=device["password"],
+                known_hosts=None,
+                connect_timeout=CONNECT_TIMEOUT,
+            ) as conn:
+                logger.info("Connected to %s", host)
+                # encoding=None hands back the raw bytes received, which is exactly
+                # what gets hashed and written; no decode/re-encode round trip
+                config_result = await conn.run(JUNIPER_COMMAND, check=True, timeout=CONFIG_READ_TIMEOUT, encoding=None)
+        except asyncssh.TimeoutError as e:
+            # A ProcessError subclass, but the channel worked: Netmiko would only wait
+            # through another full CONFIG_READ_TIMEOUT
+            error_msg = f"Timed out reading the configuration of {host}: {e}"
+            logger.error(error_msg)
+            return False, error_msg
+        except (asyncssh.ChannelOpenError, asyncssh.ProcessError) as e:
+            # Some Junos setups (e.g. users without a CLI login shell) reject exec channels
+            logger.warning("asyncssh exec failed for %s (%s), falling back to Netmiko", host, e)
+            return await asyncio.to_thread(backup_router, device, repo, known_hashes)
+        except (OSError, asyncssh.Error) as e:
+            # Unreachable host, refused/timed out connection, auth failure or disconnect:
+            # Netmiko would fail the same way, so don't retry through it
+            error_msg = f"Failed to connect to {host}: {e}"
+            logger.error(error_msg)
+            return False, error_msg
+        except Exception as e:
+            error_msg = f"An error occurred with {host}: {e}"
+            logger.error(error_msg, exc_info=True)
+            return False, error_msg
+
+    config_data = config_result.stdout
+    del config_result
+    device_hostname = parse_device_hostname(config_data, host)
+
+    try:
+        # File writes and rotation are blocking, keep them off the event loop
+        result = await asyncio.to_thread(save_backup, repo, host, device_hostname, config_data, known_hashes, start_time)
+        return True, result
+    except Exception as e:
+        error_msg = f"An error occurred with {host}: {e}"
+        logger.error(error_msg, exc_info=True)
+        return False, error_msg
+
+async def run_backups_async(devices, repo, known_hashes):
+    """Runs every device backup concurrently on one event loop."""
+    # asyncio primitives are bound to the running loop, so they are created per job
+    job_limit = asyncio.Semaphore(MAX_CONCURRENCY)
+    host_limits = {}
+    for device in devices:
+        if device["host"] not in host_limits:
+            host_limits[device["host"]] = asyncio.Semaphore(MAX_SESSIONS_PER_HOST)
+    return await asyncio.gather(
+        *(backup_router_async(device, repo, known_hashes, job_limit, host_limits[device["host"]]) for device in devices),
+        return_exceptions=True
+    )
+
+def build_notification_message(success_details, failed_hosts, total_routers, job_end_str, total_duration):
+    """Builds the Telegram job summary (Markdown)."""
+    separator = "━━━━━━━━━━━━━━━━━━━━━━━━━━"
+    status_icon = "⚠️" if failed_hosts else "✅"
+    
+    # Device List (Success)
+    success_block = "*✅ Dispositivos com Sucesso:*\n" + "\n".join(
+        f"  • `{d['hostname']}` ({d['size_kb']/1024:.2f}MB{' - sem alterações' if d['unchanged'] else ''})"
+        for d in success_details
+    ) + "\n\n" if success_details else ""
+    
+    # Device List (Failure)
+    failure_block = "*❌ Falhas:*\n" + "\n".join(
+        f"  • `{f['ip']}`\n     ↳ _{str(f['error'])[:50]}_"
+        for f in failed_hosts
+    ) + "\n\n" if failed_hosts else ""
+    
+    # Footer
+    if failed_hosts:
+        footer = "⚠️ *Backup finalizado com erros*"
+    else:
+        # Only configs that changed were written; unchanged ones reuse the previous file
+        written = [d for d in success_details if not d['unchanged']]
+        total_size_mb = sum(d['size_kb'] for d in written) / 1024
+        footer = f"🎉 *Backup Concluído!*\n📊 Total: `{len(written)} arquivos` • `{total_size_mb:.2f}MB`"
+    
+    return (
+        f"🔧 *JUNIPER BACKUP SYSTEM*\n"
+        f"{separator}\n"
+        f"\n"
+        f"📅 *Data/Hora:* `{job_end_str}`\n"
+        f"⏱️ *Duração:* `{int(total_duration)}s`\n"
+        f"\n"
+        f"{status_icon} *Status:* `{len(success_details)}/{total_routers} Sucessos`\n"
+        f"\n"
+        f"{success_block}"
+        f"{failure_block}"
+        f"{separator}\n"
+        f"{footer}"
+    )
+
 def update_healthcheck_timestamp():
     """Updates timestamp file for healthcheck monitoring."""
     try:
-        with open('/tmp/last_run', 'w') as f:
-            f.write(str(time.time()))
+        try:
+            # healthcheck.py only reads the mtime, so a single utime is enough
+            os.utime(HEALTHCHECK_FILE, None)
+        except FileNotFoundError:
+            # First run: create the file, its mtime is already "now"
+            open(HEALTHCHECK_FILE, "a").close()
     except Exception as e:
-        logger.warning(f"Could not update healthcheck timestamp: {e}")
+        logger.warning("Could not update healthcheck timestamp: %s", e)
 
 
 def run_backup_job():
@@ -348,14 +892,14 @@ def run_backup_job():
     try:
         os.makedirs(BACKUP_DIR, exist_ok=True)
     except Exception as e:
-        logger.error(f"Failed to create backup dir {BACKUP_DIR}: {e}")
+        logger.error("Failed to create backup dir %s: %s", BACKUP_DIR, e)
         # Continue might fail if dir doesn't exist, but maybe it does
     
     # Initialize Git (if fails, we might still proceed with file backup)
     try:
         repo = init_git_repo()
     except Exception as e:
-        logger.error(f"Failed to init git repo: {e}")
+        logger.error("Failed to init git repo: %s", e)
         repo = None
 
     routers = load_inventory()
@@ -364,83 +908,83 @@ def run_backup_job():
         logger.warning("No routers found in inventory.yaml.")
         return
 
-    logger.info(f"Starting backup for {len(routers)} devices.")
-    job_start_time = datetime.datetime.now()
+    known_hashes = load_config_hashes()
+
+    logger.info("Starting backup for %d devices.", len(routers))
+    job_start_time = time.perf_counter()
     
     success_details = []
     failed_hosts = []
 
-    # Use ThreadPoolExecutor for parallel backups
-    max_workers = min(len(routers), 10)
-    
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Submit tasks
-        future_to_host = {executor.submit(backup_router, router, repo): router.get('host') for router in routers}
+    # Reject entries without credentials up front: they fail deterministically,
+    # so there is no point in spending a worker (or retries) on them
+    devices = []
+    for router in routers:
+        device, error_msg = complete_device(router)
+        if device is None:
+            logger.error(error_msg)
+            failed_hosts.append({"ip": router.get('host'), "error": error_msg})
+        else:
+            devices.append(device)
+
+    if devices and SSH_BACKEND == "asyncssh":
+        # Single event loop multiplexing every SSH session
+        outcomes = asyncio.run(run_backups_async(devices, repo, known_hashes))
+        for device, outcome in zip(devices, outcomes):
+            host = device['host']
+            if isinstance(outcome, BaseException):
+                failed_hosts.append({"ip": host, "error": f"Task exception: {outcome}"})
+                continue
+            success, result = outcome
+            if success:
+                success_details.append(result)
+            else:
+                failed_hosts.append({"ip": host, "error": result})
+    elif devices:
+        # Use ThreadPoolExecutor for parallel backups (SSH is I/O-bound, threads scale well)
+        max_workers = min(len(devices), MAX_CONCURRENCY)
+        worker = backup_router_netconf if SSH_BACKEND == "netconf" else backup_router
         
-        for future in concurrent.futures.as_completed(future_to_host):
-            host = future_to_host[future]
-            try:
-                success, result = future.result()
-                if success:
-                    success_details.append(result)
-                else:
-                    failed_hosts.append({"ip": host, "error": result})
-            except Exception as exc:
-                failed_hosts.append({"ip": host, "error": f"Thread exception: {exc}"})
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # Submit tasks
+            future_to_host = {executor.submit(worker, device, repo, known_hashes): device['host'] for device in devices}
+            
+            for future in concurrent.futures.as_completed(future_to_host):
+                host = future_to_host[future]
+                try:
+                    success, result = future.result()
+                    if success:
+                        success_details.append(result)
+                    else:
+                        failed_hosts.append({"ip": host, "error": result})
+                except Exception as exc:
+                    failed_hosts.append({"ip": host, "error": f"Thread exception: {exc}"})
+
+    total_duration = time.perf_counter() - job_start_time
+    n = datetime.datetime.now()
+    job_end_str = f"{n.day:02d}/{n.month:02d}/{n.year:04d} {n.hour:02d}:{n.minute:02d}:{n.second:02d}"
 
-    job_end_time = datetime.datetime.now()
-    total_duration = (job_end_time - job_start_time).total_seconds()
+    # Commit every new backup of this job at once (one index write, one commit)
+    entries = [(d['filename'], d['blob_id']) for d in success_details if not d['unchanged']]
+    committed = False
+    if repo is not None and entries:
+        message = f"Backup job {job_end_str} — {len(entries)} devices\n\n" + "\n".join(f for f, _ in entries)
+        with GIT_LOCK:
+            committed = commit_to_git(repo, entries, message)
+
+    if success_details:
+        for detail in success_details:
+            if detail['unchanged'] or committed:
+                known_hashes[detail['hostname']] = {"hash": detail['hash'], "filename": detail['filename']}
+            else:
+                # Not in Git yet: record no hash, so the next run doesn't consider
+                # this config unchanged (not even against the file on disk) and commits it
+                known_hashes[detail['hostname']] = {"hash": None, "filename": detail['filename']}
+        save_config_hashes(known_hashes)
 
     # Send Telegram Notification
     if failed_hosts or success_details:
-        total_routers = len(routers)
-        success_count = len(success_details)
-        total_size_mb = sum(d['size_kb'] for d in success_details) / 1024
-        
-        # Header
-        message_lines = []
-        message_lines.append("🔧 *JUNIPER BACKUP SYSTEM*")
-        message_lines.append("━━━━━━━━━━━━━━━━━━━━━━━━━━")
-        message_lines.append("")
-        
-        # Metrics
-        message_lines.append(f"📅 *Data/Hora:* `{job_end_time.strftime('%d/%m/%Y %H:%M:%S')}`")
-        message_lines.append(f"⏱️ *Duração:* `{int(total_duration)}s`")
-        message_lines.append("")
-        
-        # Success Icon/Count
-        if failed_hosts:
-            message_lines.append(f"⚠️ *Status:* `{success_count}/{total_routers} Sucessos`")
-        else:
-            message_lines.append(f"✅ *Status:* `{success_count}/{total_routers} Sucessos`")
-        message_lines.append("")
-
-        # Device List (Success)
-        if success_details:
-            message_lines.append("*✅ Dispositivos com Sucesso:*")
-            for detail in success_details:
-                size_str = f"{detail['size_kb']/1024:.2f}MB"
-                message_lines.append(f"  • `{detail['hostname']}` ({size_str})")
-            message_lines.append("")
-        
-        # Device List (Failure)
-        if failed_hosts:
-            message_lines.append("*❌ Falhas:*")
-            for failed in failed_hosts:
-                error_msg = str(failed['error'])[:50]
-                message_lines.append(f"  • `{failed['ip']}`")
-                message_lines.append(f"     ↳ _{error_msg}_")
-            message_lines.append("")
-            
-        # Footer
-        message_lines.append("━━━━━━━━━━━━━━━━━━━━━━━━━━")
-        if not failed_hosts:
-            message_lines.append(f"🎉 *Backup Concluído!*")
-            message_lines.append(f"📊 Total: `{len(success_details)} arquivos` • `{total_size_mb:.2f}MB`")
-        else:
-            message_lines.append(f"⚠️ *Backup finalizado com erros*")
-
-        message = "\n".join(message_lines)
+        message = build_notification_message(success_details, failed_hosts, len(routers), job_end_str, total_duration)
         send_telegram_notification(message)
 
     # Update healthcheck timestamp at end
@@ -452,10 +996,14 @@ def run_backup_job():
 
 def main():
     logger.info("Starting Backup Application (Non-Root)...")
-    logger.info(f"Python version: {os.sys.version}")
+    logger.info("Python version: %s", os.sys.version)
     
     # Validate environment
     validate_environment()
+    logger.info("SSH backend: %s", SSH_BACKEND)
+    
+    # Close SSH sessions that stay idle between runs for too long
+    start_session_reaper()
     
     # Disabled: Run backup immediately on startup
     # This prevents duplicate notifications when container restarts
@@ -463,19 +1011,22 @@ def main():
     # run_backup_job()
     
     # Scheduling Logic
-    backup_time = os.getenv("BACKUP_TIME")
-    
-    if backup_time:
-        logger.info(f"Schedule: Daily at {backup_time}.")
-        schedule.every().day.at(backup_time).do(run_backup_job)
+    if BACKUP_TIME:
+        logger.info("Schedule: Daily at %s.", BACKUP_TIME)
+        schedule.every().day.at(BACKUP_TIME).do(run_backup_job)
     else:
-        logger.info(f"Schedule: Every {BACKUP_INTERVAL_MINUTES} minutes.")
+        logger.info("Schedule: Every %s minutes.", BACKUP_INTERVAL_MINUTES)
         schedule.every(BACKUP_INTERVAL_MINUTES).minutes.do(run_backup_job)
     
-    # Loop
+    # Loop: sleep until the next job is due instead of polling every second.
+    # The sleep is capped so a wall-clock correction (NTP, manual change) delays
+    # a job by at most SCHEDULER_MAX_SLEEP seconds.
     while True:
         schedule.run_pending()
-        time.sleep(1)
+        idle = schedule.idle_seconds()
+        if idle is None:
+            idle = SCHEDULER_MAX_SLEEP
+        time.sleep(min(max(idle, 1), SCHEDULER_MAX_SLEEP))
 
 if __name__ == "__main__":
     main()